@@ -1,10 +1,31 @@
 import os
 import tempfile
 from typing import Literal
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from .run_script import run_script
 
 
+def write_parquet(df: pd.DataFrame, file_path: str) -> None:
+    """
+    Write a DataFrame to Parquet with pyarrow, keeping the index as a column.
+
+    Args:
+        df (pd.DataFrame): DataFrame to write.
+        file_path (str): Path to the output Parquet file.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    pq.write_table(
+        table,
+        file_path,
+        compression="zstd",
+        compression_level=1,
+        use_dictionary=False,
+    )
+
+
 def run_script_wrapper(
     rp_matrix: pd.DataFrame,
     metadata: pd.DataFrame,
@@ -53,8 +74,8 @@ def run_script_wrapper(
         metadata.index.name = None
 
         # Save data to disk
-        rp_matrix.to_parquet(rp_matrix_file)
-        metadata.to_parquet(metadata_file)
+        write_parquet(rp_matrix.astype(np.float32), rp_matrix_file)
+        write_parquet(metadata, metadata_file)
 
         # Run script
         run_script(
@@ -66,8 +87,10 @@ def run_script_wrapper(
         )
 
         # Load results
-        embeddings = pd.read_parquet(embeddings_file)
+        embeddings = pq.read_table(embeddings_file).to_pandas(
+            split_blocks=True, self_destruct=True
+        )
 
     embeddings.set_index("__index_level_0__", inplace=True)
     embeddings.index.name = None
-    return embeddings
+    return embeddings.astype(np.float32)
@@ -1,2 +1,2 @@
-from .synthesize import synthesize, standardize
+from .synthesize import synthesize, standardize, synthesize_and_standardize
 from .test_samples import generate_test_samples
@@ -1,10 +1,14 @@
-import tempfile
-import subprocess
-from typing import List
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import pybedtools
 
+BED_COLUMNS = ["chrom", "start", "end"]
+
 
 def multi_intersect(
     file_paths: List[str], merge_distance: int = 0
@@ -12,8 +16,11 @@ def multi_intersect(
     """
     Intersects multiple BED files and merges the intersected regions.
 
+    The files must already be sorted by chromosome and start position (e.g. with sortBed);
+    bedtools multiinter and merge sweep the inputs without sorting them.
+
     Args:
-        file_paths (List[str]): List of file paths to BED files.
+        file_paths (List[str]): List of file paths to coordinate-sorted BED files.
         merge_distance (int, optional): Distance for merging intervals. Defaults to 0.
 
     Returns:
@@ -24,29 +31,101 @@ def multi_intersect(
     return result.merge(c=c, o="max", d=merge_distance)
 
 
+def read_bed(file_path: str) -> pa.Table:
+    """
+    Reads the first three columns of a BED file into an Arrow table.
+
+    Args:
+        file_path (str): Path to the BED file.
+
+    Returns:
+        pa.Table: Table with 'chrom', 'start' and 'end' columns.
+    """
+    schema = pa.schema(
+        [("chrom", pa.string()), ("start", pa.int64()), ("end", pa.int64())]
+    )
+    if os.path.getsize(file_path) == 0:
+        return schema.empty_table()
+
+    table = pacsv.read_csv(
+        file_path,
+        read_options=pacsv.ReadOptions(autogenerate_column_names=True),
+        parse_options=pacsv.ParseOptions(delimiter="\t", quote_char=False),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=["f0", "f1", "f2"],
+            column_types={"f0": pa.string(), "f1": pa.int64(), "f2": pa.int64()},
+        ),
+    )
+    return table.rename_columns(BED_COLUMNS)
+
+
+def write_bed(table: pa.Table, file_path: str) -> None:
+    """
+    Writes an Arrow table as a headerless, tab-separated BED file.
+
+    Args:
+        table (pa.Table): Table whose columns are written in order.
+        file_path (str): Path to the output BED file.
+    """
+    write_options = pacsv.WriteOptions(
+        include_header=False, delimiter="\t", quoting_style="none"
+    )
+    pacsv.write_csv(table, file_path, write_options=write_options)
+
+
+def sort_order(table: pa.Table) -> np.ndarray:
+    """
+    Computes the row order that sorts a BED table by chromosome and start position.
+
+    Args:
+        table (pa.Table): Table with 'chrom' and 'start' columns.
+
+    Returns:
+        np.ndarray: Row positions in sorted order; ties keep their original order.
+    """
+    chroms = table.column("chrom").combine_chunks().dictionary_encode()
+    names = chroms.dictionary.to_numpy(zero_copy_only=False)
+
+    # Rank chromosomes lexicographically, like sortBed, and pack (rank, start) in one key
+    rank = np.empty(len(names), dtype=np.int64)
+    rank[np.argsort(names)] = np.arange(len(names))
+    key = (rank[chroms.indices.to_numpy()] << 32) | table.column("start").to_numpy()
+
+    # Stable sorting is a timsort, which merges presorted runs in linear passes
+    return np.argsort(key, kind="stable")
+
+
 def concatenate(file_paths: List[str]) -> pybedtools.BedTool:
     """
     Concatenates multiple BED files and sorts the result.
 
+    Sorting is cheapest when each file is already coordinate-sorted, as the stable sort
+    then only merges one sorted run per file.
+
     Args:
         file_paths (List[str]): List of file paths to BED files.
 
     Returns:
         pybedtools.BedTool: A BedTool object with the concatenated and sorted intervals.
     """
-    with tempfile.NamedTemporaryFile() as temp_file:
-        command = [
-            "awk",
-            "-v",
-            "OFS=\t",
-            "FNR==1 {idx++} {print $1, $2, $3, idx-1}",
-            *file_paths,
-        ]
 
-        with open(temp_file.name, "w") as f:
-            subprocess.run(command, stdout=f, check=True)
+    def read_indexed(idx: int, file_path: str) -> pa.Table:
+        table = read_bed(file_path)
+        return table.append_column(
+            "idx", pa.array(np.full(table.num_rows, idx, dtype=np.int32))
+        )
+
+    # Read files in parallel; pyarrow releases the GIL while parsing
+    with ThreadPoolExecutor() as executor:
+        tables = list(executor.map(read_indexed, range(len(file_paths)), file_paths))
 
-        return pybedtools.BedTool(temp_file.name).sort()
+    table = pa.concat_tables(tables)
+    table = table.take(sort_order(table))
+
+    # Let pybedtools own the file so it is cleaned up with its other temp files
+    file_path = pybedtools.BedTool._tmp()
+    write_bed(table, file_path)
+    return pybedtools.BedTool(file_path)
 
 
 def bedtool_to_dataframe(
@@ -65,56 +144,110 @@ def bedtool_to_dataframe(
     Returns:
         pd.DataFrame: DataFrame representation of the BedTool object.
     """
-    base_columns = ["chrom", "start", "end"]
+    table = read_bedtool(result, file_columns, report_original_peaks)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_bedtool(
+    result: pybedtools.BedTool,
+    file_columns: List[str],
+    report_original_peaks: bool = False,
+) -> pa.Table:
+    """
+    Reads the file of a BedTool object into an Arrow table.
+
+    Args:
+        result (pybedtools.BedTool): The BedTool object to read.
+        file_columns (List[str]): List of column names for the BED file.
+        report_original_peaks (bool, optional): Whether to include original peak columns. Defaults to False.
+
+    Returns:
+        pa.Table: Table representation of the BedTool object.
+    """
+    base_columns = [("chrom", pa.string()), ("start", pa.int64()), ("end", pa.int64())]
     original_peak_columns = [
-        "chrom_original",
-        "start_original",
-        "end_original",
-        "idx",
-        "overlap",
+        ("chrom_original", pa.string()),
+        ("start_original", pa.int64()),
+        ("end_original", pa.int64()),
+        ("idx", pa.int32()),
+        ("overlap", pa.int64()),
     ]
 
-    column_names = base_columns + file_columns
+    fields = base_columns + [(column, pa.int32()) for column in file_columns]
     if report_original_peaks:
-        column_names += original_peak_columns
-
-    return result.to_dataframe(disable_auto_names=True, names=column_names)
+        fields += original_peak_columns
+    schema = pa.schema(fields)
+
+    if os.path.getsize(result.fn) == 0:
+        return schema.empty_table()
+
+    return pacsv.read_csv(
+        result.fn,
+        read_options=pacsv.ReadOptions(column_names=schema.names),
+        parse_options=pacsv.ParseOptions(delimiter="\t", quote_char=False),
+        convert_options=pacsv.ConvertOptions(
+            column_types={field.name: field.type for field in schema}
+        ),
+    )
 
 
 def compute_weighted_sum(
     df: pd.DataFrame,
     file_columns: List[str],
-    weights: List[float] | None = None,
+    weights: List[float] | List[List[float]] | None = None,
+    raw_file_columns: bool = True,
+    weight_columns: bool = False,
 ) -> pd.DataFrame:
     """
     Computes the weighted sum of specified columns in a DataFrame.
 
+    The columns are treated as normalized to [-1, 1] (2x - 1) in the sum.
+
     Args:
         df (pd.DataFrame): The DataFrame containing the data.
         file_columns (List[str]): List of column names to be included in the weighted sum.
-        weights (List[float], optional): List of weights for each column. If None, columns are summed without weights. Defaults to None.
+        weights (List[float] | List[List[float]], optional): List of weights for each column. If None, columns are summed without weights.
+            A 2D list of shape (columns, groups) computes one weighted sum per group. Defaults to None.
+        raw_file_columns (bool, optional): Whether to leave the columns as they are. If False, they are overwritten
+            with their normalized values. Defaults to True.
+        weight_columns (bool, optional): Whether to also add the 1D weights as constant 'weight_{i}' columns. Defaults to False.
 
     Returns:
-        pd.DataFrame: DataFrame with the weighted sum and weights as additional columns.
+        pd.DataFrame: DataFrame with the weighted sum as an additional column ('weighted_sum_{g}' columns for 2D weights).
+            1D weights are stored in `df.attrs["weights"]`.
     """
-    # Normalize the columns to [-1, 1]
-    df[file_columns] = 2 * df[file_columns] - 1
+    X = df[file_columns].to_numpy()
+
+    # The normalization is folded into the sums below, so only write it if asked
+    if not raw_file_columns:
+        df[file_columns] = 2 * X - 1
 
     # If weights are not provided, sum the columns
     if weights is None:
-        df["weighted_sum"] = df[file_columns].sum(axis=1)
+        df["weighted_sum"] = 2 * X.sum(axis=1) - X.shape[1]
         return df
 
-    # Compute the weighted sum
-    df["weighted_sum"] = np.dot(df[file_columns], weights)
+    # Compute the weighted sum: (2X - 1) @ w == 2 * (X @ w) - sum(w)
+    w = np.asarray(weights, dtype=np.float32)
+    X = X.astype(np.float32, copy=False)
 
-    # Add weights as columns for reference
-    weights_df = pd.DataFrame(
-        np.tile(weights, (df.shape[0], 1)),
-        index=df.index,
-        columns=[f"weight_{i}" for i in range(len(weights))],
-    )
-    return pd.concat([df, weights_df], axis=1)
+    # One weighted sum per group of weights
+    if w.ndim == 2:
+        columns = [f"weighted_sum_{g}" for g in range(w.shape[1])]
+        XW = np.einsum("nk,kg->ng", X, w, optimize="greedy")
+        df[columns] = 2 * XW - w.sum(axis=0)
+        return df
+
+    df["weighted_sum"] = 2 * (X @ w) - w.sum()
+
+    # Keep the weights for reference; consumers index them by file on demand
+    df.attrs["weights"] = [float(weight) for weight in weights]
+
+    # Broadcast the weights as a read-only view, written into a single block
+    if weight_columns:
+        columns = [f"weight_{i}" for i in range(len(w))]
+        df[columns] = np.broadcast_to(w, (len(df), len(w)))
+    return df
 
 
 def compute_midpoints(df: pd.DataFrame, weighted: bool = False) -> pd.DataFrame:
@@ -131,13 +264,52 @@ def compute_midpoints(df: pd.DataFrame, weighted: bool = False) -> pd.DataFrame:
     if weighted:
         return compute_weighted_midpoints(df=df)
 
+    start, end = df["start"].to_numpy(), df["end"].to_numpy()
+    rows, _ = factorize_intervals(pd.factorize(df["chrom"])[0], start, end)
+
     return (
-        df.drop_duplicates(["chrom", "start", "end"])
+        df.take(rows)
         .reset_index(drop=True)
-        .assign(midpoint=lambda x: x[["start", "end"]].mean(axis=1))
+        .assign(midpoint=(start[rows] + end[rows]) / 2)
     )
 
 
+def factorize_intervals(
+    chrom_codes: np.ndarray, start: np.ndarray, end: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Numbers the distinct intervals in order of first appearance.
+
+    Args:
+        chrom_codes (np.ndarray): Integer code of the chromosome of each interval.
+        start (np.ndarray): Start position of each interval.
+        end (np.ndarray): End position of each interval.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Sorted row positions of the first occurrence of each
+            distinct interval, and the number of the distinct interval for every row.
+    """
+    # A stable sort keeps duplicates in their original order
+    order = np.lexsort((end, start, chrom_codes))
+    chrom_codes, start, end = chrom_codes[order], start[order], end[order]
+
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (
+        (chrom_codes[1:] != chrom_codes[:-1])
+        | (start[1:] != start[:-1])
+        | (end[1:] != end[:-1])
+    )
+
+    # Renumber the sorted groups by the position of their first row
+    first_rows = order[first]
+    rank = np.empty(len(first_rows), dtype=np.int64)
+    rank[np.argsort(first_rows)] = np.arange(len(first_rows))
+
+    groups = np.empty(len(order), dtype=np.int64)
+    groups[order] = rank[np.cumsum(first) - 1]
+    return np.sort(first_rows), groups
+
+
 def compute_weighted_midpoints(df: pd.DataFrame) -> pd.DataFrame:
     """
     Computes the weighted midpoints of intervals in a DataFrame.
@@ -148,55 +320,73 @@ def compute_weighted_midpoints(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: DataFrame with the computed weighted midpoints.
     """
-    weight_columns = [f"weight_{i}" for i in df["idx"].unique()]
-
-    df = df.assign(
-        midpoint=lambda x: x[["start_original", "end_original"]].mean(axis=1)
+    rows, groups = factorize_intervals(
+        pd.factorize(df["chrom"])[0], df["start"].to_numpy(), df["end"].to_numpy()
     )
-
-    melted_df = (
-        df.melt(
-            id_vars=["chrom", "start", "end", "idx", "midpoint"],
-            value_vars=weight_columns,
-        )
-        .assign(tmp_col=lambda x: "weight_" + x["idx"].astype(str))
-        .query("variable == tmp_col")
-        .assign(weighted_terms=lambda x: x["midpoint"] * x["value"])
+    midpoint = average_original_midpoints(
+        df["start_original"].to_numpy(),
+        df["end_original"].to_numpy(),
+        original_peak_weights(df),
+        groups,
     )
 
-    midpoints = (
-        melted_df.groupby(["chrom", "start", "end"])
-        .agg(
-            sum_weighted_terms=("weighted_terms", "sum"),
-            sum_weights=("value", "sum"),
-        )
-        .assign(midpoint=lambda x: np.divide(x["sum_weighted_terms"], x["sum_weights"]))
-        .reindex(["midpoint"], axis=1)
-    )
+    return df.take(rows).reset_index(drop=True).assign(midpoint=midpoint)
 
-    return (
-        df.drop_duplicates(["chrom", "start", "end"])
-        .drop(columns="midpoint")
-        .reset_index(drop=True)
-        .merge(midpoints, on=["chrom", "start", "end"])
+
+def original_peak_weights(df: pd.DataFrame) -> np.ndarray:
+    """
+    Looks up the weight of the file each original peak comes from.
+
+    The weights are read from `df.attrs["weights"]`, or else from the 'weight_{i}' columns.
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing the interval data and its file weights.
+
+    Returns:
+        np.ndarray: The weight of each row.
+
+    Raises:
+        ValueError: If the DataFrame carries neither the weights attribute nor weight columns.
+    """
+    idx = df["idx"].to_numpy()
+    if "weights" in df.attrs:
+        return np.asarray(df.attrs["weights"], dtype=np.float64)[idx]
+
+    # attrs do not survive e.g. pd.concat of frames with different weights
+    files = np.unique(idx)
+    columns = [f"weight_{i}" for i in files]
+    if all(column in df.columns for column in columns):
+        weights = df[columns].to_numpy(dtype=np.float64)
+        return weights[np.arange(len(df)), np.searchsorted(files, idx)]
+
+    raise ValueError(
+        "Weighted midpoints need the file weights: pass 1D weights to synthesize, "
+        "or keep its 'weight_{i}' columns"
     )
 
 
-def fixed_widths(df: pd.DataFrame, fixed_width: int = 200) -> pd.DataFrame:
+def average_original_midpoints(
+    start_original: np.ndarray,
+    end_original: np.ndarray,
+    weight: np.ndarray,
+    groups: np.ndarray,
+) -> np.ndarray:
     """
-    Adjusts the start and end positions of intervals to have a fixed width centered around the midpoint.
+    Computes the weighted average midpoint of the original peaks in each group.
 
     Args:
-        df (pd.DataFrame): The DataFrame containing the interval data with a 'midpoint' column.
-        fixed_width (int, optional): The fixed width for the intervals. Defaults to 200.
+        start_original (np.ndarray): Start position of each original peak.
+        end_original (np.ndarray): End position of each original peak.
+        weight (np.ndarray): Weight of each original peak.
+        groups (np.ndarray): Group number of each original peak.
 
     Returns:
-        pd.DataFrame: DataFrame with adjusted 'start' and 'end' columns.
+        np.ndarray: The weighted midpoint of each group.
     """
-    half_width = fixed_width // 2
-    df["start"] = np.maximum(df["midpoint"] - half_width, 0).astype(int)
-    df["end"] = (df["midpoint"] + half_width).astype(int)
-    return df
+    midpoint = (start_original + end_original) / 2
+    sum_weighted_terms = np.bincount(groups, weights=midpoint * weight)
+    sum_weights = np.bincount(groups, weights=weight)
+    return np.divide(sum_weighted_terms, sum_weights)
 
 
 def adjust_intervals_to_fixed_width(df: pd.DataFrame, width: int = 200) -> pd.DataFrame:
@@ -210,7 +400,26 @@ def adjust_intervals_to_fixed_width(df: pd.DataFrame, width: int = 200) -> pd.Da
     Returns:
         pd.DataFrame: DataFrame with adjusted 'start' and 'end' columns.
     """
-    half_width = width // 2
-    df["start"] = np.maximum(df["midpoint"] - half_width, 0).astype(int)
-    df["end"] = (df["midpoint"] + half_width).astype(int)
+    df["start"], df["end"] = fixed_width_intervals(df["midpoint"].to_numpy(), width)
     return df
+
+
+def fixed_width_intervals(
+    midpoint: np.ndarray, width: int = 200
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the start and end positions of fixed-width intervals centered around midpoints.
+
+    Args:
+        midpoint (np.ndarray): The midpoints of the intervals.
+        width (int, optional): The fixed width for the intervals. Defaults to 200.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The start positions (clipped at 0) and end positions.
+    """
+    half_width = width // 2
+    midpoint = midpoint.astype(np.int64)
+
+    start = midpoint - half_width
+    np.maximum(start, 0, out=start)
+    return start, midpoint + half_width
@@ -1,4 +1,5 @@
 from typing import List
+import numpy as np
 import pandas as pd
 from . import helpers as h
 
@@ -8,15 +9,19 @@ def synthesize(
     weights: List[float] | None = None,
     merge_distance: int = 0,
     report_original_peaks: bool = False,
+    raw_file_columns: bool = True,
+    weight_columns: bool = False,
 ) -> pd.DataFrame:
     """
     Synthesizes data from multiple BED files by intersecting, merging, and computing weighted sums.
 
     Args:
-        file_paths (List[str]): List of file paths to BED files.
+        file_paths (List[str]): List of file paths to BED files, each sorted by chromosome and start position.
         weights (List[float], optional): List of weights for each file. If None, columns are summed without weights. Defaults to None.
         merge_distance (int, optional): Distance for merging intervals. Defaults to 0.
         report_original_peaks (bool, optional): Whether to include original peak columns. Defaults to False.
+        raw_file_columns (bool, optional): Whether to keep the 0/1 file columns as they are instead of normalizing them to [-1, 1]. Defaults to True.
+        weight_columns (bool, optional): Whether to add the weights as constant 'weight_{i}' columns. Defaults to False.
 
     Returns:
         pd.DataFrame: DataFrame with the synthesized data.
@@ -34,7 +39,9 @@ def synthesize(
     df = h.bedtool_to_dataframe(result, file_columns, report_original_peaks)
 
     # Compute weighted sum
-    return h.compute_weighted_sum(df, file_columns, weights)
+    return h.compute_weighted_sum(
+        df, file_columns, weights, raw_file_columns, weight_columns
+    )
 
 
 def standardize(
@@ -55,3 +62,69 @@ def standardize(
     if width:
         return h.adjust_intervals_to_fixed_width(df, width)
     return df
+
+
+def synthesize_and_standardize(
+    file_paths: List[str],
+    weights: List[float] | None = None,
+    merge_distance: int = 0,
+    weighted: bool = False,
+    width: int | None = 200,
+    raw_file_columns: bool = True,
+) -> pd.DataFrame:
+    """
+    Synthesizes and standardizes intervals from multiple BED files in a single pass.
+
+    Equivalent to `standardize(synthesize(file_paths, weights, merge_distance, weighted, raw_file_columns), weighted, width)`,
+    but the intersection is deduplicated and its midpoints computed on the parsed arrays, so only the kept rows are
+    ever converted to a DataFrame.
+
+    Args:
+        file_paths (List[str]): List of file paths to BED files, each sorted by chromosome and start position.
+        weights (List[float], optional): List of weights for each file. If None, columns are summed without weights. Defaults to None.
+        merge_distance (int, optional): Distance for merging intervals. Defaults to 0.
+        weighted (bool, optional): Whether to compute weighted midpoints from the original peaks. Requires weights. Defaults to False.
+        width (int, optional): The fixed width for the intervals. If None, intervals are not adjusted. Defaults to 200.
+        raw_file_columns (bool, optional): Whether to keep the 0/1 file columns as they are instead of normalizing them to [-1, 1]. Defaults to True.
+
+    Returns:
+        pd.DataFrame: DataFrame with the synthesized and standardized intervals.
+    """
+    if weighted and weights is None:
+        raise ValueError("Weights are required to compute weighted midpoints.")
+
+    # Multi-intersect and merge nearby peaks
+    result = h.multi_intersect(file_paths, merge_distance)
+
+    # Concatenate original peaks and intersect with results
+    if weighted:
+        concat = h.concatenate(file_paths)
+        result = result.intersect(concat, wo=True, sorted=True)
+
+    file_columns = [f"file_{i}" for i in range(len(file_paths))]
+    table = h.read_bedtool(result, file_columns, report_original_peaks=weighted)
+    start = table.column("start").to_numpy()
+    end = table.column("end").to_numpy()
+
+    if weighted:
+        # Each merged interval is repeated once per overlapping original peak
+        chroms = table.column("chrom").combine_chunks().dictionary_encode()
+        rows, groups = h.factorize_intervals(chroms.indices.to_numpy(), start, end)
+        midpoint = h.average_original_midpoints(
+            table.column("start_original").to_numpy(),
+            table.column("end_original").to_numpy(),
+            np.asarray(weights)[table.column("idx").to_numpy()],
+            groups,
+        )
+        table = table.take(rows)
+    else:
+        # Merged intervals are already distinct
+        midpoint = (start + end) / 2
+
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    df = h.compute_weighted_sum(df, file_columns, weights, raw_file_columns)
+    df["midpoint"] = midpoint
+
+    if width:
+        return h.adjust_intervals_to_fixed_width(df, width)
+    return df
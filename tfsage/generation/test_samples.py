@@ -1,4 +1,5 @@
 import pandas as pd
+import pyarrow as pa
 import pybedtools
 from . import helpers as h
 
@@ -56,10 +57,7 @@ def generate_positive_samples(
         pybedtools.BedTool: BedTool object containing the positive samples.
     """
     if width:
-        df = pybedtools.BedTool(target_file).to_dataframe()
-        df = h.compute_midpoints(df, weighted=False)
-        df = h.adjust_intervals_to_fixed_width(df, width)
-        return pybedtools.BedTool.from_dataframe(df)
+        return standardize_bed(target_file, width)
     return pybedtools.BedTool(target_file)
 
 
@@ -85,12 +83,35 @@ def generate_negative_samples(
     negative_samples = negative_samples.subtract(target_file, A=True)
     negative_samples = negative_samples.subtract(positive_samples, A=True)
     if width:
-        df = negative_samples.to_dataframe()
-        df = h.compute_midpoints(df, weighted=False)
-        df = h.adjust_intervals_to_fixed_width(df, width)
-
-        negative_samples = pybedtools.BedTool.from_dataframe(df)
+        negative_samples = standardize_bed(negative_samples.fn, width)
         negative_samples = negative_samples.subtract(target_file, A=True)
         negative_samples = negative_samples.subtract(positive_samples, A=True)
 
     return negative_samples
+
+
+def standardize_bed(file_path: str, width: int = 200) -> pybedtools.BedTool:
+    """
+    Deduplicates the intervals of a BED file and resizes them to a fixed width around their midpoints.
+
+    Args:
+        file_path (str): Path to the BED file.
+        width (int, optional): The fixed width for the intervals. Defaults to 200.
+
+    Returns:
+        pybedtools.BedTool: BedTool object containing the fixed-width intervals.
+    """
+    table = h.read_bed(file_path)
+    chroms = table.column("chrom").combine_chunks()
+    start = table.column("start").to_numpy()
+    end = table.column("end").to_numpy()
+
+    rows, _ = h.factorize_intervals(
+        chroms.dictionary_encode().indices.to_numpy(), start, end
+    )
+    start, end = h.fixed_width_intervals((start[rows] + end[rows]) / 2, width)
+    table = pa.table({"chrom": chroms.take(rows), "start": start, "end": end})
+
+    output_file = pybedtools.BedTool._tmp()
+    h.write_bed(table, output_file)
+    return pybedtools.BedTool(output_file)
@@ -1,4 +1,4 @@
 from .load_gene_loc_set import load_gene_loc_set
 from .compute import compute
-from .compute_batch import compute_batch
-from .prepare import prepare_genome, prepare_region_set
+from .compute_batch import compute_batch, compute_batch_to_parquet
+from .prepare import prepare_genome, prepare_region_set, read_region_arrays
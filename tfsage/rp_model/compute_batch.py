@@ -1,10 +1,14 @@
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from typing import List
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from tqdm import tqdm
 from lisa.core import genome_tools
-from .common import compute_helper, extract_region_names
+from .common import compute_rp, extract_region_names, file_is_empty
 
 # Global variable for the worker processes
 global_gene_loc_set = None
@@ -23,26 +27,26 @@ def initialize_worker(gene_loc_set: genome_tools.RegionSet) -> None:
 
 def process_bed_file(bed_file: str, decay: float = 10_000) -> np.ndarray:
     """
-    Process a single BED file and return the RP scores.
+    Process a single non-empty BED file and return the RP scores.
 
     Args:
-        bed_file (str): Path to the BED file containing regions.
+        bed_file (str): Path to the non-empty BED file containing regions.
         decay (float): Decay parameter for the RP calculation (default is 10,000).
 
     Returns:
         np.ndarray: An array of RP scores for each gene location.
     """
-    return compute_helper(bed_file, global_gene_loc_set, decay)
+    return compute_rp(bed_file, global_gene_loc_set, decay)
 
 
-def compute_batch(
+def compute_rp_vectors(
     bed_files: List[str],
     gene_loc_set: genome_tools.RegionSet,
     decay: float = 10_000,
     max_workers: int | None = None,
-) -> pd.DataFrame:
+) -> List[np.ndarray]:
     """
-    Compute the RP scores for a list of BED files.
+    Compute the RP scores for a list of BED files in parallel.
 
     Args:
         bed_files (List[str]): A list of paths to BED files containing regions.
@@ -51,22 +55,119 @@ def compute_batch(
         max_workers (int | None): The maximum number of workers to use for parallel processing (default is None).
 
     Returns:
-        pd.DataFrame: A DataFrame of RP scores for each gene location, with columns corresponding to each BED file.
+        List[np.ndarray]: One array of RP scores per BED file, in the order of `bed_files`.
     """
-    results = [None] * len(bed_files)
+    # Empty files score zero everywhere; they all share one read-only vector
+    empty = [file_is_empty(bed_file) for bed_file in bed_files]
+    zeros = np.zeros(len(gene_loc_set.regions), dtype=np.float32)
+    zeros.flags.writeable = False
+
+    non_empty_files = [f for f, is_empty in zip(bed_files, empty) if not is_empty]
+    if not non_empty_files:
+        return [zeros] * len(bed_files)
+
+    # Hand out files in chunks to amortize inter-process communication
+    num_workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(non_empty_files) // (4 * num_workers))
+
     with ProcessPoolExecutor(
         max_workers=max_workers,
         initializer=initialize_worker,
         initargs=(gene_loc_set,),
     ) as executor:
-        futures = {
-            executor.submit(process_bed_file, bed_file, decay): i
-            for i, bed_file in enumerate(bed_files)
-        }
-        for future in tqdm(as_completed(futures), total=len(futures)):
-            index = futures[future]
-            results[index] = future.result()
+        results = iter(
+            list(
+                tqdm(
+                    executor.map(
+                        partial(process_bed_file, decay=decay),
+                        non_empty_files,
+                        chunksize=chunksize,
+                    ),
+                    total=len(non_empty_files),
+                )
+            )
+        )
+        return [zeros if is_empty else next(results) for is_empty in empty]
+
+
+def compute_batch(
+    bed_files: List[str],
+    gene_loc_set: genome_tools.RegionSet,
+    decay: float = 10_000,
+    max_workers: int | None = None,
+) -> pd.DataFrame:
+    """
+    Compute the RP scores for a list of BED files.
+
+    Args:
+        bed_files (List[str]): A list of paths to BED files containing regions.
+        gene_loc_set (genome_tools.RegionSet): A RegionSet object containing gene locations.
+        decay (float): Decay parameter for the RP calculation (default is 10,000).
+        max_workers (int | None): The maximum number of workers to use for parallel processing (default is None).
+
+    Returns:
+        pd.DataFrame: A DataFrame of RP scores for each gene location, with columns corresponding to each BED file.
+    """
+    results = compute_rp_vectors(bed_files, gene_loc_set, decay, max_workers)
 
     # Ensure the rp_vectors are properly shaped into a 2D matrix
     rp_matrix = np.stack(results).T
     return pd.DataFrame(rp_matrix, index=extract_region_names(gene_loc_set))
+
+
+def compute_batch_to_parquet(
+    bed_files: List[str],
+    gene_loc_set: genome_tools.RegionSet,
+    output_file: str,
+    column_names: List[str] | None = None,
+    decay: float = 10_000,
+    max_workers: int | None = None,
+    row_group_size: int = 16_384,
+) -> None:
+    """
+    Compute the RP scores for a list of BED files and write them to a Parquet file.
+
+    With the default column names the file has the same layout as
+    `compute_batch(...).to_parquet(output_file)`, but is written in row groups straight
+    from the per-file arrays without building the dense matrix.
+
+    Args:
+        bed_files (List[str]): A list of paths to BED files containing regions.
+        gene_loc_set (genome_tools.RegionSet): A RegionSet object containing gene locations.
+        output_file (str): Path to the output Parquet file.
+        column_names (List[str] | None): Unique column name for each BED file. If None, the columns are numbered 0..N-1 like `compute_batch` (default is None).
+        decay (float): Decay parameter for the RP calculation (default is 10,000).
+        max_workers (int | None): The maximum number of workers to use for parallel processing (default is None).
+        row_group_size (int): Number of gene locations per Parquet row group (default is 16,384).
+
+    Raises:
+        ValueError: If `column_names` does not hold one unique name per BED file.
+    """
+    if column_names is None:
+        column_names = pd.RangeIndex(len(bed_files))
+    elif len(column_names) != len(bed_files):
+        raise ValueError(
+            f"Expected {len(bed_files)} column names, got {len(column_names)}"
+        )
+    elif len(set(column_names)) != len(column_names):
+        raise ValueError("Column names must be unique")
+
+    results = compute_rp_vectors(bed_files, gene_loc_set, decay, max_workers)
+    region_names = extract_region_names(gene_loc_set)
+
+    # Derive the schema (including pandas metadata for the index) from a single row
+    schema = pa.Schema.from_pandas(
+        pd.DataFrame(
+            np.zeros((1, len(results)), dtype=np.float32),
+            index=region_names[:1],
+            columns=column_names,
+        ),
+        preserve_index=True,
+    )
+
+    with pq.ParquetWriter(output_file, schema) as writer:
+        for start in range(0, len(region_names), row_group_size):
+            end = start + row_group_size
+            arrays = [pa.array(result[start:end]) for result in results]
+            arrays.append(pa.array(region_names[start:end], type=pa.string()))
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
@@ -1,4 +1,9 @@
+from dataclasses import dataclass
+from typing import Dict, Tuple
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from lisa.core import genome_tools
 
 # Overwrite the check_region method to avoid checking region
@@ -42,3 +47,67 @@ def prepare_region_set(
     """
     regions = genome_tools.Region.read_bedfile(region_file)
     return genome_tools.RegionSet(regions, genome)
+
+
+@dataclass
+class RegionArrays:
+    """
+    Genomic regions stored as column arrays instead of one Region object per row.
+
+    Attributes:
+        chromosomes (np.ndarray): Distinct chromosome names.
+        chrom_codes (np.ndarray): Index into `chromosomes` for each region.
+        starts (np.ndarray): Start position of each region.
+        ends (np.ndarray): End position of each region.
+    """
+
+    chromosomes: np.ndarray
+    chrom_codes: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+
+    def split_by_chrom(self) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Group region starts and ends by chromosome.
+
+        Returns:
+            Dict[str, Tuple[np.ndarray, np.ndarray]]: Mapping from chromosome to the starts and ends of its regions.
+        """
+        order = np.argsort(self.chrom_codes, kind="stable")
+        counts = np.bincount(self.chrom_codes, minlength=len(self.chromosomes))
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        return {
+            chrom: (
+                self.starts[order[bounds[i] : bounds[i + 1]]],
+                self.ends[order[bounds[i] : bounds[i + 1]]],
+            )
+            for i, chrom in enumerate(self.chromosomes)
+        }
+
+
+def read_region_arrays(region_file: str) -> RegionArrays:
+    """
+    Read the regions of a BED file into column arrays.
+
+    Args:
+        region_file (str): Path to the region file. The file should be in BED format.
+
+    Returns:
+        RegionArrays: The chromosomes, starts and ends of the regions in the file.
+    """
+    table = pacsv.read_csv(
+        region_file,
+        read_options=pacsv.ReadOptions(autogenerate_column_names=True),
+        parse_options=pacsv.ParseOptions(delimiter="\t", quote_char=False),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=["f0", "f1", "f2"],
+            column_types={"f0": pa.string(), "f1": pa.int64(), "f2": pa.int64()},
+        ),
+    )
+    chroms = table.column("f0").dictionary_encode().combine_chunks()
+    return RegionArrays(
+        chromosomes=chroms.dictionary.to_numpy(zero_copy_only=False),
+        chrom_codes=chroms.indices.to_numpy(),
+        starts=table.column("f1").to_numpy(),
+        ends=table.column("f2").to_numpy(),
+    )
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from sklearn.metrics import pairwise_distances
 
@@ -16,8 +17,39 @@ def compute_distances(
     Returns:
         pd.DataFrame: DataFrame containing the pairwise distances, with the same index and columns as the input embeddings.
     """
+    X = embeddings.to_numpy(dtype=np.float32)
+    if metric in ("cosine", "correlation"):
+        distances = cosine_distances(X, center=metric == "correlation")
+    else:
+        distances = pairwise_distances(X, metric=metric)
+
     return pd.DataFrame(
-        pairwise_distances(embeddings, metric=metric),
+        distances,
         index=embeddings.index,
         columns=embeddings.index,
     )
+
+
+def cosine_distances(X: np.ndarray, center: bool = False) -> np.ndarray:
+    """
+    Compute pairwise cosine distances between the rows of a matrix with a single matrix product.
+
+    Args:
+        X (np.ndarray): Matrix with one embedding per row.
+        center (bool): Whether to subtract the row means first, which yields correlation distances (default: False).
+
+    Returns:
+        np.ndarray: Matrix of pairwise distances in [0, 2], with zeros on the diagonal.
+    """
+    if center:
+        X = X - X.mean(axis=1, keepdims=True)
+
+    # Leave all-zero rows as they are, like sklearn's normalize
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    X = X / norms
+
+    distances = 1 - X @ X.T
+    np.clip(distances, 0, 2, out=distances)
+    np.fill_diagonal(distances, 0)
+    return distances
@@ -1 +1 @@
-from .download_experiment import download_experiment
+from .download_experiment import download_experiment, download_experiments
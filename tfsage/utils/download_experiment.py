@@ -1,20 +1,189 @@
+import base64
+import errno
+import hashlib
+import io
+import mmap
+import os
+import shutil
 import subprocess
 import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import partial
+from typing import BinaryIO, Callable, Dict, Iterator, List, Literal, Tuple
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+from urllib3.util import Retry
+
+try:
+    # ISA-L's gzip implementation is several times faster than zlib
+    from isal.igzip import IGzipFile as GzipFile
+except ImportError:
+    from gzip import GzipFile
+
+# Keep-alive connections per host, enough for a default batch of downloads. Requests beyond
+# this wait for a pooled connection instead of opening one that is discarded afterwards.
+MAX_CONNECTIONS_PER_HOST = 32
+
+# Failed requests and dropped transfers are retried with exponential backoff
+MAX_RETRIES = 5
+RETRY_BACKOFF_FACTOR = 1.0
+RETRY_BACKOFF_MAX = 30.0
+
+# Shared session so repeated downloads reuse pooled keep-alive connections
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=MAX_CONNECTIONS_PER_HOST,
+        pool_block=True,
+        max_retries=Retry(
+            total=MAX_RETRIES,
+            backoff_factor=RETRY_BACKOFF_FACTOR,
+            backoff_max=RETRY_BACKOFF_MAX,
+            status_forcelist=(429, 500, 502, 503, 504),
+        ),
+    ),
+)
+
+SortBackend = Literal["inprocess", "sortBed", "gnu"]
+
+# Files at least this large are downloaded over several ranged connections
+RANGED_DOWNLOAD_MIN_SIZE = 64 << 20
+RANGED_DOWNLOAD_PARTS = 4
+CHUNK_SIZE = 1 << 20
+
+# Sorted output is written through a large buffer, a block of lines at a time
+OUTPUT_BUFFER_SIZE = 1 << 20
+OUTPUT_BLOCK_LINES = 1 << 16
+
+# Lines that carry no regions and are dropped before sorting
+_HEADER_PREFIXES = ("track", "browser", "#")
+_NEWLINE = ord("\n")
 
 
 def download_experiment(
-    experiment_id: str, output_file: str, genome: str = "hg38"
+    experiment_id: str,
+    output_file: str,
+    genome: str = "hg38",
+    use_cache: bool = True,
+    sort_backend: SortBackend = "inprocess",
+    scratch_dir: str | None = None,
 ) -> None:
     """
     Download an experiment from ENCODE or ChIP-Atlas.
 
+    Sorted downloads are cached under $TFSAGE_CACHE (default ~/.cache/tfsage), keyed by genome
+    and experiment ID, so repeated requests for the same experiment are copied from disk.
+
+    Args:
+        experiment_id (str): The ID of the experiment to download.
+        output_file (str): The path to the output file where the downloaded data will be saved.
+        genome (str): The genome assembly to use (default is "hg38"). Only necessary for ChIP-Atlas.
+        use_cache (bool): Whether to read from and populate the local cache (default is True).
+        sort_backend (SortBackend): How to sort the regions: "inprocess" with pyarrow and numpy,
+            or by piping into bedtools' "sortBed" or a multi-threaded "gnu" sort (default is
+            "inprocess").
+        scratch_dir (str | None): Directory for downloads that are staged before sorting (default
+            is None, which uses $TFSAGE_SCRATCH or /var/tmp).
+    """
+    _download_experiment(
+        experiment_id, output_file, genome, use_cache, sort_backend, scratch_dir
+    )
+
+
+def download_experiments(
+    experiments: Dict[str, str],
+    genome: str = "hg38",
+    max_workers: int = 12,
+    use_cache: bool = True,
+    sort_backend: SortBackend = "inprocess",
+    scratch_dir: str | None = None,
+) -> None:
+    """
+    Download many experiments from ENCODE or ChIP-Atlas concurrently.
+
+    Each download is sorted in its own thread as it streams in; the in-process sort spends
+    its time in pyarrow and numpy, which release the GIL.
+
+    Args:
+        experiments (Dict[str, str]): Mapping from experiment ID to the path of its output file.
+        genome (str): The genome assembly to use (default is "hg38"). Only necessary for ChIP-Atlas.
+        max_workers (int): The maximum number of concurrent downloads (default is 12).
+        use_cache (bool): Whether to read from and populate the local cache (default is True).
+        sort_backend (SortBackend): How to sort the regions (default is "inprocess").
+        scratch_dir (str | None): Directory for downloads that are staged before sorting (default
+            is None, which uses $TFSAGE_SCRATCH or /var/tmp).
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _download_experiment,
+                experiment_id,
+                output_file,
+                genome,
+                use_cache,
+                sort_backend,
+                scratch_dir,
+            )
+            for experiment_id, output_file in experiments.items()
+        ]
+        try:
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                future.result()
+        except BaseException:
+            # Report the first failure without waiting for the queued downloads
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+
+def _download_experiment(
+    experiment_id: str,
+    output_file: str,
+    genome: str = "hg38",
+    use_cache: bool = True,
+    sort_backend: SortBackend = "inprocess",
+    scratch_dir: str | None = None,
+) -> None:
+    """
+    Download an experiment, going through the local cache if enabled.
+
     Args:
         experiment_id (str): The ID of the experiment to download.
         output_file (str): The path to the output file where the downloaded data will be saved.
         genome (str): The genome assembly to use (default is "hg38"). Only necessary for ChIP-Atlas.
+        use_cache (bool): Whether to read from and populate the local cache (default is True).
+        sort_backend (SortBackend): How to sort the regions (default is "inprocess").
+        scratch_dir (str | None): Directory for staged downloads (default is None, which uses
+            $TFSAGE_SCRATCH or /var/tmp).
     """
     url = _get_url(experiment_id, genome)
-    _curl_and_sort(url, output_file)
+    if not use_cache:
+        _download_and_sort(url, output_file, sort_backend, scratch_dir)
+        return
+
+    cache_file = _get_cache_file(experiment_id, genome)
+    if not os.path.exists(cache_file):
+        # Write next to the cache entry and rename it in place, so readers never see partial files
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(cache_file))
+        os.close(fd)
+        try:
+            _download_and_sort(url, tmp_file, sort_backend, scratch_dir)
+            os.replace(tmp_file, cache_file)
+        except BaseException:
+            os.remove(tmp_file)
+            raise
+
+    shutil.copyfile(cache_file, output_file)
 
 
 def _get_url(experiment_id: str, genome: str = "hg38") -> str:
@@ -28,31 +197,687 @@ def _get_url(experiment_id: str, genome: str = "hg38") -> str:
     Returns:
         str: The URL to download the experiment data.
     """
-    is_encode = experiment_id.startswith("ENC")
-    if is_encode:
-        return "https://www.encodeproject.org/files/{experiment_id}/@@download/{experiment_id}.bed.gz".format(
-            experiment_id=experiment_id
+    if experiment_id.startswith("ENC"):
+        return f"https://www.encodeproject.org/files/{experiment_id}/@@download/{experiment_id}.bed.gz"
+
+    # ChIP-Atlas IDs look like SRX000000.05, where the suffix is the peak threshold
+    threshold = experiment_id.partition(".")[2]
+    template = _CHIP_ATLAS_TEMPLATES.get(threshold)
+    if template is None:
+        template = _chip_atlas_template(threshold)
+    return template.format(genome=genome, experiment_id=experiment_id)
+
+
+def _chip_atlas_template(threshold: str) -> str:
+    """
+    Get the ChIP-Atlas URL template for a peak threshold.
+
+    Args:
+        threshold (str): The peak threshold, such as "05".
+
+    Returns:
+        str: A URL template with {genome} and {experiment_id} fields.
+    """
+    return f"https://chip-atlas.dbcls.jp/data/{{genome}}/eachData/bed{threshold}/{{experiment_id}}.bed"
+
+
+# ChIP-Atlas publishes peaks at these -log10(q) thresholds
+_CHIP_ATLAS_TEMPLATES = {
+    threshold: _chip_atlas_template(threshold) for threshold in ("05", "10", "20", "50")
+}
+
+
+def _get_cache_file(experiment_id: str, genome: str = "hg38") -> str:
+    """
+    Get the cache path of a sorted experiment download.
+
+    Args:
+        experiment_id (str): The ID of the experiment.
+        genome (str): The genome assembly of the experiment (default is "hg38").
+
+    Returns:
+        str: The path of the cached, sorted BED file.
+    """
+    cache_dir = os.environ.get("TFSAGE_CACHE", os.path.join("~", ".cache", "tfsage"))
+    return os.path.join(
+        os.path.expanduser(cache_dir), genome, f"{experiment_id}.sorted.bed"
+    )
+
+
+def _get_scratch_dir() -> str:
+    """
+    Get the directory for staged downloads.
+
+    /var/tmp is on disk on most systems, unlike /tmp, which is often a small tmpfs.
+
+    Returns:
+        str: $TFSAGE_SCRATCH if set, otherwise /var/tmp.
+    """
+    return os.environ.get("TFSAGE_SCRATCH", "/var/tmp")
+
+
+def _download_and_sort(
+    url: str,
+    output_file: str,
+    sort_backend: SortBackend = "inprocess",
+    scratch_dir: str | None = None,
+) -> None:
+    """
+    Download and sort file from URL and save to output file path.
+
+    The download is streamed through the shared session straight into the sorter, so nothing
+    is staged on disk. .gz files are decompressed in process as they arrive, using ISA-L
+    when the isal package is installed. Large files on servers that accept byte ranges are
+    instead fetched over several connections into a temporary file, which is then sorted.
+
+    Args:
+        url (str): The URL to download the file from.
+        output_file (str): The path to the output file where the sorted data will be saved.
+        sort_backend (SortBackend): How to sort the regions (default is "inprocess").
+        scratch_dir (str | None): Directory for staged downloads (default is None, which uses
+            $TFSAGE_SCRATCH or /var/tmp).
+    """
+    gzipped = url.endswith(".gz")
+    with _SESSION.get(url, stream=True) as response:
+        response.raise_for_status()
+
+        size = int(response.headers.get("Content-Length", 0))
+        ranged = (
+            size >= RANGED_DOWNLOAD_MIN_SIZE
+            and response.headers.get("Accept-Ranges") == "bytes"
+            and "Content-Encoding" not in response.headers
         )
-    else:
-        return "https://chip-atlas.dbcls.jp/data/{genome}/eachData/bed{threshold}/{experiment_id}.bed".format(
-            genome=genome,
-            threshold=experiment_id.split(".")[1],
-            experiment_id=experiment_id,
+        if not ranged:
+            _sort_response(response, gzipped, output_file, sort_backend)
+            return
+
+        # Only the headers were read; the ranges go straight to the redirected URL
+        response.close()
+        with _scratch_file(scratch_dir) as (fd, tmp_file):
+            if not _download_ranges(response.url, fd, size):
+                # The server ignored the ranges after all
+                os.ftruncate(fd, 0)
+                with _SESSION.get(url, stream=True) as retry:
+                    retry.raise_for_status()
+                    _write_response(retry, fd)
+
+            _sort_bed_file(tmp_file, gzipped, output_file, sort_backend)
+
+
+@contextmanager
+def _scratch_file(scratch_dir: str | None = None) -> Iterator[Tuple[int, str]]:
+    """
+    Create a temporary file for a staged download and remove it afterwards.
+
+    Args:
+        scratch_dir (str | None): Directory to create the file in (default is None, which uses
+            $TFSAGE_SCRATCH or /var/tmp).
+
+    Yields:
+        Tuple[int, str]: The file descriptor and path of the file.
+    """
+    fd, path = tempfile.mkstemp(suffix=".part", dir=scratch_dir or _get_scratch_dir())
+    try:
+        yield fd, path
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+
+def _write_response(response: requests.Response, fd: int) -> None:
+    """
+    Write the body of a streamed response to a file, undoing any transfer encoding.
+
+    Args:
+        response (requests.Response): The streamed response.
+        fd (int): File descriptor of the file to write into.
+    """
+    body = _VerifiedBody(response)
+    with open(fd, "wb", closefd=False) as f:
+        shutil.copyfileobj(body, f, CHUNK_SIZE)
+    body.verify()
+
+
+class _VerifiedBody:
+    """
+    Read-through view of a streamed response body that checks it arrived intact.
+
+    The body's length and, when the server sends a Content-MD5 header, its MD5 digest are
+    computed as the bytes are read, so verifying a download needs no second pass over it.
+    If the connection drops, the body is resumed from the last byte read with a Range
+    request, after an exponential backoff. Any transfer encoding is undone, in which case
+    the headers describe the encoded bytes: only the underlying connection's length checks
+    apply, and dropped connections are not resumed.
+    """
+
+    def __init__(self, response: requests.Response):
+        self._response = response
+        self._raw = response.raw
+        self._raw.decode_content = True
+        self._url = response.url
+        self._resumable = "Content-Encoding" not in response.headers
+        self._length = None
+        self._md5 = None
+        if self._resumable:
+            if "Content-Length" in response.headers:
+                self._length = int(response.headers["Content-Length"])
+            if "Content-MD5" in response.headers:
+                self._md5 = response.headers["Content-MD5"]
+        self._hash = hashlib.md5() if self._md5 else None
+        self._count = 0
+
+    def read(self, size: int = -1) -> bytes:
+        return self._retry(lambda: self._raw.read(size))
+
+    def readinto(self, buffer: memoryview) -> int:
+        data = self.read(len(buffer))
+        memoryview(buffer).cast("B")[: len(data)] = data
+        return len(data)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self._retry(lambda: self._raw.readline(size))
+
+    def _retry(self, read: Callable[[], bytes]) -> bytes:
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                data = read()
+                break
+            except (ProtocolError, ReadTimeoutError):
+                if not self._resumable or attempt == MAX_RETRIES:
+                    raise
+                time.sleep(_backoff(attempt))
+                self._resume()
+
+        self._count += len(data)
+        if self._hash is not None:
+            self._hash.update(data)
+        return data
+
+    def _resume(self) -> None:
+        """
+        Reopen the body at the first byte that has not been read yet.
+        """
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+        headers = {"Range": f"bytes={self._count}-", "Accept-Encoding": "identity"}
+        response = _SESSION.get(self._url, headers=headers, stream=True)
+        self._response = response
+        response.raise_for_status()
+        self._raw = response.raw
+
+        # The server ignored the range, so skip the bytes that were already read
+        if response.status_code != 206:
+            skip = self._count
+            while skip:
+                chunk = self._raw.read(min(skip, CHUNK_SIZE))
+                if not chunk:
+                    raise IOError(f"{self._url} is shorter than before")
+                skip -= len(chunk)
+
+    def verify(self) -> None:
+        """
+        Check the bytes read so far against the response headers.
+
+        Raises:
+            IOError: If the body is shorter or longer than its Content-Length, or its MD5
+                digest does not match Content-MD5.
+        """
+        if self._length is not None and self._count != self._length:
+            raise IOError(
+                f"Expected {self._length} bytes from {self._url}, got {self._count}"
+            )
+        if self._hash is not None:
+            digest = base64.b64encode(self._hash.digest()).decode()
+            if digest != self._md5:
+                raise IOError(f"MD5 mismatch for {self._url}: {digest} != {self._md5}")
+
+
+def _sort_response(
+    response: requests.Response,
+    gzipped: bool,
+    output_file: str,
+    sort_backend: SortBackend,
+) -> None:
+    """
+    Sort the body of a streamed response as it arrives.
+
+    Args:
+        response (requests.Response): The streamed response with the BED data.
+        gzipped (bool): Whether the payload is a gzipped file.
+        output_file (str): The path to the output file where the sorted data will be saved.
+        sort_backend (SortBackend): How to sort the regions.
+    """
+    body = _VerifiedBody(response)
+    # .gz payloads are still gzipped once any transfer encoding is undone
+    gzipped = gzipped and response.headers.get("Content-Encoding") != "gzip"
+    _sort_bed(GzipFile(fileobj=body) if gzipped else body, output_file, sort_backend)
+    body.verify()
+
+
+def _download_ranges(url: str, fd: int, size: int) -> bool:
+    """
+    Download a file over several ranged connections into a preallocated file.
+
+    Args:
+        url (str): The URL to download the file from.
+        fd (int): File descriptor of the file to write into.
+        size (int): The size of the file in bytes.
+
+    Returns:
+        bool: True if every part was downloaded, False if the server does not honor ranges.
+    """
+    if hasattr(os, "posix_fallocate"):
+        os.posix_fallocate(fd, 0, size)
+
+    bounds = [
+        size * i // RANGED_DOWNLOAD_PARTS for i in range(RANGED_DOWNLOAD_PARTS + 1)
+    ]
+    with ThreadPoolExecutor(max_workers=RANGED_DOWNLOAD_PARTS) as executor:
+        return all(
+            executor.map(partial(_download_range, url, fd), bounds[:-1], bounds[1:])
         )
 
 
-def _curl_and_sort(url: str, output_file: str) -> None:
+def _download_range(url: str, fd: int, start: int, end: int) -> bool:
     """
-    Download and sort file from URL and save to output file path.
+    Download the bytes [start, end) of a file and write them at the same offset.
 
     Args:
         url (str): The URL to download the file from.
+        fd (int): File descriptor of the file to write into.
+        start (int): The first byte to download.
+        end (int): The byte after the last one to download.
+
+    Returns:
+        bool: True if the part was downloaded, False if the server does not honor ranges.
+    """
+    offset = start
+    for attempt in range(MAX_RETRIES + 1):
+        # Retries pick up where the previous attempt stopped
+        headers = {"Range": f"bytes={offset}-{end - 1}", "Accept-Encoding": "identity"}
+        try:
+            with _SESSION.get(url, headers=headers, stream=True) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    return False
+
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    view = memoryview(chunk)
+                    while view:
+                        written = os.pwrite(fd, view, offset)
+                        view = view[written:]
+                        offset += written
+            break
+        except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(_backoff(attempt))
+
+    if offset != end:
+        raise IOError(f"Expected {end - start} bytes from {url}, got {offset - start}")
+    return True
+
+
+def _backoff(attempt: int) -> float:
+    """
+    Get the delay before retrying a failed download.
+
+    Args:
+        attempt (int): The number of the attempt that failed, starting from 0.
+
+    Returns:
+        float: The delay in seconds, which doubles with every attempt up to a cap.
+    """
+    return min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_FACTOR * 2**attempt)
+
+
+def _sort_bed_file(
+    input_file: str, gzipped: bool, output_file: str, sort_backend: SortBackend
+) -> None:
+    """
+    Sort a downloaded BED file with the given backend.
+
+    Args:
+        input_file (str): The path to the downloaded file.
+        gzipped (bool): Whether the downloaded file is gzipped.
+        output_file (str): The path to the output file where the sorted data will be saved.
+        sort_backend (SortBackend): How to sort the regions.
+    """
+    with open(input_file, "rb") as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+        if sort_backend == "inprocess" and not gzipped:
+            # Parse straight from the page cache instead of reading into a buffer first
+            if os.fstat(f.fileno()).st_size == 0:
+                _sort_bed_buffer(b"", output_file)
+                return
+            error = None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                try:
+                    _sort_bed_buffer(mm, output_file)
+                except Exception as e:
+                    # The frames of the traceback still hold views of the mapping, which
+                    # cannot be closed while they exist
+                    cause = e
+                    while cause is not None:
+                        traceback.clear_frames(cause.__traceback__)
+                        cause = cause.__context__
+                    error = e
+            if error is not None:
+                raise error
+            return
+
+        _sort_bed(GzipFile(fileobj=f) if gzipped else f, output_file, sort_backend)
+
+
+def _sort_bed(source: BinaryIO, output_file: str, sort_backend: SortBackend) -> None:
+    """
+    Sort BED data with the given backend.
+
+    Args:
+        source (BinaryIO): The stream of BED data to sort.
+        output_file (str): The path to the output file where the sorted data will be saved.
+        sort_backend (SortBackend): How to sort the regions.
+    """
+    if sort_backend == "inprocess":
+        _sort_bed_inprocess(source, output_file)
+    elif sort_backend == "sortBed":
+        _sort_bed_subprocess(["sortBed", "-i", "stdin"], source, output_file)
+    elif sort_backend == "gnu":
+        _sort_bed_gnu(source, output_file)
+    else:
+        raise ValueError(f"Unknown sort backend: {sort_backend}")
+
+
+def _sort_bed_inprocess(source: BinaryIO, output_file: str) -> None:
+    """
+    Sort BED data by chromosome and start position in process, like sortBed.
+
+    Args:
+        source (BinaryIO): The stream of BED data to sort.
+        output_file (str): The path to the output file where the sorted data will be saved.
+    """
+    _sort_bed_buffer(source.read(), output_file)
+
+
+def _sort_bed_buffer(buffer: bytes | mmap.mmap, output_file: str) -> None:
+    """
+    Sort BED data held in memory by chromosome and start position.
+
+    Only the chromosome and start fields are parsed, with pyarrow's CSV reader; the lines
+    themselves are copied to the output byte for byte, in sorted order. Leading header
+    (track, browser, #) lines, comment lines and blank lines are dropped.
+
+    Args:
+        buffer (bytes | mmap.mmap): The BED data to sort.
+        output_file (str): The path to the output file where the sorted data will be saved.
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    if len(data) and data[-1] != _NEWLINE:
+        data = np.append(data, np.uint8(_NEWLINE))
+
+    # Every line spans [start, end), including its newline. Newlines are searched a block
+    # at a time, so the comparison never materializes a mask of the whole buffer.
+    ends = np.concatenate(
+        [np.empty(0, dtype=np.int64)]
+        + [
+            np.flatnonzero(data[block : block + CHUNK_SIZE] == _NEWLINE) + block + 1
+            for block in range(0, len(data), CHUNK_SIZE)
+        ]
+    )
+    starts = np.concatenate(([0], ends[:-1]))[: len(ends)]
+    keep = _region_lines(data, starts, ends)
+
+    with open(output_file, "wb", buffering=OUTPUT_BUFFER_SIZE) as f:
+        if not keep.any():
+            return
+        if not keep.all():
+            data = np.frombuffer(
+                _gather_lines(data, starts[keep], ends[keep]), dtype=np.uint8
+            )
+            ends = np.cumsum(ends[keep] - starts[keep])
+            starts = np.concatenate(([0], ends[:-1]))
+
+        keys = _read_sort_keys(data, starts, ends)
+        if len(keys) != len(starts):
+            raise ValueError("Could not parse the chromosome and start of every region")
+
+        if _is_sorted(keys):
+            # Peak files are often sorted already; keep their order as it is
+            f.write(data)
+            return
+
+        # Stable sorting is a timsort, which merges presorted runs in linear passes
+        order = np.argsort(keys, kind="stable")
+        for block in range(0, len(order), OUTPUT_BLOCK_LINES):
+            lines = order[block : block + OUTPUT_BLOCK_LINES]
+            f.write(_gather_lines(data, starts[lines], ends[lines]))
+
+
+def _region_lines(data: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Find the lines of BED data that hold regions.
+
+    Args:
+        data (np.ndarray): The BED data as bytes.
+        starts (np.ndarray): Offsets of the lines.
+        ends (np.ndarray): Offsets just past the newline of each line.
+
+    Returns:
+        np.ndarray: A boolean mask that is False for header, comment and blank lines.
+    """
+    first = data[starts]
+    lengths = ends - starts
+    keep = (first != _NEWLINE) & (first != ord("#"))
+    keep &= ~((first == ord("\r")) & (lengths == 2))
+
+    # Track and browser lines only appear before the first region
+    prefixes = tuple(prefix.encode() for prefix in _HEADER_PREFIXES)
+    for line, (start, end) in enumerate(zip(starts, ends)):
+        if not keep[line]:
+            continue
+        if not data[start:end].tobytes().startswith(prefixes):
+            break
+        keep[line] = False
+    return keep
+
+
+def _read_sort_keys(
+    data: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> np.ndarray:
+    """
+    Parse the chromosome and start of every line of BED data into one sort key.
+
+    Args:
+        data (np.ndarray): The BED data as bytes, without header or blank lines.
+        starts (np.ndarray): Offsets of the lines.
+        ends (np.ndarray): Offsets just past the newline of each line.
+
+    Returns:
+        np.ndarray: Per line, the lexicographic rank of its chromosome in the upper 32 bits
+            and its start position in the lower 32 bits.
+    """
+    try:
+        table = pacsv.read_csv(
+            pa.py_buffer(data),
+            # Batches sort several files at once; a single thread also keeps the peak
+            # memory of the parser to a few blocks
+            read_options=pacsv.ReadOptions(
+                autogenerate_column_names=True, use_threads=False
+            ),
+            parse_options=pacsv.ParseOptions(delimiter="\t", quote_char=False),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=["f0", "f1"],
+                column_types={
+                    "f0": pa.dictionary(pa.int32(), pa.string()),
+                    "f1": pa.int64(),
+                },
+            ),
+        ).unify_dictionaries()
+    except pa.ArrowInvalid:
+        # Lines with differing numbers of fields; split off the keys one line at a time
+        view = memoryview(data)
+        fields = [
+            view[start:end].tobytes().split(b"\t", 2)
+            for start, end in zip(starts.tolist(), ends.tolist())
+        ]
+        _, codes = np.unique([f[0] for f in fields], return_inverse=True)
+        positions = np.array([int(f[1]) for f in fields], dtype=np.int64)
+        return (codes.astype(np.int64) << 32) | positions
+
+    chroms = table.column("f0")
+    if chroms.num_chunks == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Rank chromosomes lexicographically, like sortBed, and pack (rank, start) in one key
+    names = chroms.chunk(0).dictionary.to_numpy(zero_copy_only=False)
+    rank = np.empty(len(names), dtype=np.int64)
+    rank[np.argsort(names)] = np.arange(len(names))
+    indices = np.concatenate([chunk.indices.to_numpy() for chunk in chroms.chunks])
+    return (rank[indices] << 32) | table.column("f1").to_numpy()
+
+
+def _gather_lines(data: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> bytes:
+    """
+    Concatenate byte ranges of BED data.
+
+    Args:
+        data (np.ndarray): The BED data as bytes.
+        starts (np.ndarray): Offsets of the lines to concatenate.
+        ends (np.ndarray): Offsets just past the newline of each line.
+
+    Returns:
+        bytes: The lines, one after the other.
+    """
+    view = memoryview(data)
+    return b"".join(
+        [view[start:end] for start, end in zip(starts.tolist(), ends.tolist())]
+    )
+
+
+def _is_sorted(keys: np.ndarray) -> bool:
+    """
+    Check whether regions are already sorted by chromosome and start position.
+
+    Args:
+        keys (np.ndarray): Sort keys of the regions.
+
+    Returns:
+        bool: True if no region comes before the one preceding it.
+    """
+    return bool(np.all(keys[1:] >= keys[:-1]))
+
+
+def _sort_bed_gnu(
+    source: BinaryIO, output_file: str, threads: int | None = None
+) -> None:
+    """
+    Sort BED data with GNU sort, which merge sorts on several threads.
+
+    Args:
+        source (BinaryIO): The stream of BED data to sort.
         output_file (str): The path to the output file where the sorted data will be saved.
+        threads (int | None): The number of sort threads (default is the number of CPUs).
     """
+    threads = threads or os.cpu_count() or 1
+    args = ["sort", "-s", f"--parallel={threads}", "-S", "25%", "-k1,1", "-k2,2n"]
+    # Byte-wise comparisons match sortBed's order and skip locale collation
+    env = {**os.environ, "LC_ALL": "C"}
+    _sort_bed_subprocess(args, source, output_file, env)
+
+    # Blank lines sort before every region; drop them in the rare files that have any
+    with open(output_file, "rb+") as f:
+        if f.read(1) == b"\n":
+            data = f.read().lstrip(b"\n")
+            f.seek(0)
+            f.write(data)
+            f.truncate()
+
+
+def _sort_bed_subprocess(
+    args: List[str],
+    source: BinaryIO,
+    output_file: str,
+    env: Dict[str, str] | None = None,
+) -> None:
+    """
+    Sort BED data with an external command that reads stdin.
+
+    Leading header lines are dropped, so they cannot be sorted in among the regions.
+
+    Args:
+        args (List[str]): The sort command and its arguments.
+        source (BinaryIO): The stream of BED data to sort.
+        output_file (str): The path to the output file where the sorted data will be saved.
+        env (Dict[str, str] | None): Environment of the sort command (default is the current one).
+    """
+    with open(output_file, "wb") as f:
+        sort = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=f, env=env)
+        try:
+            sort.stdin.write(_skip_header_lines(source))
+            _copy_to_pipe(source, sort.stdin)
+        except BrokenPipeError:
+            # The sorter exited early; its return code is reported below
+            pass
+        finally:
+            try:
+                sort.stdin.close()
+            except BrokenPipeError:
+                pass
+        sort.wait()
+
+    if sort.returncode != 0:
+        raise subprocess.CalledProcessError(sort.returncode, sort.args)
 
-    with tempfile.NamedTemporaryFile() as temp_file:
-        curl_command = ["curl", "-L", url, "-o", temp_file.name]
-        sort_command = ["sortBed", "-i", temp_file.name]
 
-        subprocess.run(curl_command, check=True)
-        subprocess.run(sort_command, check=True, stdout=open(output_file, "w"))
+def _copy_to_pipe(source: BinaryIO, pipe: BinaryIO) -> None:
+    """
+    Copy the rest of a stream into a pipe.
+
+    Regular files are spliced into the pipe by the kernel with sendfile, so their bytes never
+    pass through Python. Network and decompressed streams are copied in large chunks.
+
+    Args:
+        source (BinaryIO): The stream to copy from, read up to its current position.
+        pipe (BinaryIO): The pipe to copy into.
+    """
+    if isinstance(source, io.BufferedReader) and hasattr(os, "sendfile"):
+        # tell() accounts for read-ahead buffering, unlike the file descriptor's offset
+        offset = source.tell()
+        size = os.fstat(source.fileno()).st_size
+        pipe.flush()
+        try:
+            while offset < size:
+                sent = os.sendfile(
+                    pipe.fileno(), source.fileno(), offset, size - offset
+                )
+                if sent == 0:
+                    break
+                offset += sent
+            return
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS):
+                raise
+            source.seek(offset)
+
+    shutil.copyfileobj(source, pipe, CHUNK_SIZE)
+
+
+def _skip_header_lines(source: BinaryIO) -> bytes:
+    """
+    Consume the header lines at the start of a BED stream.
+
+    Args:
+        source (BinaryIO): The stream of BED data.
+
+    Returns:
+        bytes: The first line that is not a header, or b"" if the stream ends first.
+    """
+    prefixes = tuple(prefix.encode() for prefix in _HEADER_PREFIXES)
+    line = source.readline()
+    while line.startswith(prefixes):
+        line = source.readline()
+    return line